@@ -1,8 +1,11 @@
+import os
 from pathlib import Path
 
 START_YEAR = 1990        # earliest year to fetch
 END_YEAR = None          # latest year to fetch; if None, defaults to current calendar year
 BATCH_SIZE = 100         # how many IDs to fetch from PubTator per request
+REQUESTS_PER_SECOND = 10 if os.getenv("NCBI_API_KEY") else 3   # NCBI allows 10 req/s with an API key, 3 without
+MAX_CONCURRENT_REQUESTS = REQUESTS_PER_SECOND                    # batches in flight at once
 
 TERMS = [
     "Sickle cell disease",
@@ -1,14 +1,15 @@
 import os
-import json
-import time
+import shutil
 import logging
+import orjson
 import requests
-import xml.etree.ElementTree as ET
+from lxml import etree
 from pathlib import Path
-from typing import List, Dict, Iterator
+from typing import List, Dict, Iterator, Optional, Tuple
 from datetime import datetime
 
 import config
+from http_utils import BODY_READ_ERRORS, api_key_params, http_get, iter_concurrently, read_json, run_concurrently
 
 # PubMed E-utilities
 ESEARCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
@@ -21,23 +22,106 @@ DATA_DIR.mkdir(exist_ok=True)
 logger = logging.getLogger(__name__)
 
 
-def _term_file(term: str) -> Path:
+def _term_dir(term: str) -> Path:
+    safe = term.replace(" ", "_")
+    return DATA_DIR / safe
+
+
+def _legacy_term_file(term: str) -> Path:
+    """Single JSON file used before records were stored as JSONL."""
     safe = term.replace(" ", "_")
     return DATA_DIR / f"{safe}.json"
 
 
+def _parse_year(value) -> Optional[int]:
+    """Publication year as an int, or None when it is missing or not a plain year."""
+    value = str(value)
+    return int(value) if value.isdigit() else None
+
+
+def _append_records(term_dir: Path, records: List[Dict]):
+    """Append records to the term's JSONL log, one JSON object per line."""
+    path = term_dir / "records.jsonl"
+    with open(path, "ab") as f:
+        for r in records:
+            f.write(orjson.dumps(r) + b"\n")
+
+
+def _save_meta(term_dir: Path, completed_years: List[int]):
+    path = term_dir / "meta.json"
+    path.write_bytes(orjson.dumps({"completed_years": completed_years}, option=orjson.OPT_INDENT_2))
+
+
+def _read_records(path: Path) -> List[Dict]:
+    """
+    Read the JSONL log. A run killed mid-append can leave a torn last line;
+    it is dropped (and truncated away) so later appends start on a clean line.
+    """
+    records: List[Dict] = []
+    good_end = 0
+    last_line = b""
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                try:
+                    records.append(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    if f.read(1):
+                        raise  # only the last line can be torn by an interrupted append
+                    logger.warning("Dropping incomplete last record in %s", path)
+                    break
+            good_end += len(line)
+            last_line = line
+
+    if good_end < path.stat().st_size:
+        os.truncate(path, good_end)
+    elif last_line and not last_line.endswith(b"\n"):
+        with open(path, "ab") as f:
+            f.write(b"\n")
+    return records
+
+
+def _migrate_legacy(term: str):
+    """
+    Convert the legacy JSON file into the JSONL layout. The new directory is
+    built under a temporary name and renamed into place only once complete,
+    so a failed migration is retried on the next run.
+    """
+    legacy = _legacy_term_file(term)
+    data = orjson.loads(legacy.read_bytes())
+    # Older data files stored years as strings
+    for r in data.get("records", []):
+        r["year"] = _parse_year(r["year"])
+
+    term_dir = _term_dir(term)
+    tmp_dir = term_dir.with_name(term_dir.name + ".migrating")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir()
+    _append_records(tmp_dir, data.get("records", []))
+    _save_meta(tmp_dir, data.get("completed_years", []))
+
+    tmp_dir.rename(term_dir)
+    logger.info("Migrated %s to %s", legacy, term_dir)
+
+
 def _load_data(term: str) -> Dict:
-    path = _term_file(term)
-    if path.exists():
-        with open(path) as f:
-            return json.load(f)
-    return {"completed_years": [], "records": []}
+    term_dir = _term_dir(term)
+    if not term_dir.exists():
+        if _legacy_term_file(term).exists():
+            _migrate_legacy(term)
+        else:
+            term_dir.mkdir()
 
+    data = {"completed_years": [], "records": []}
+    meta_path = term_dir / "meta.json"
+    if meta_path.exists():
+        data["completed_years"] = orjson.loads(meta_path.read_bytes()).get("completed_years", [])
 
-def _save_data(term: str, data: Dict):
-    path = _term_file(term)
-    with open(path, "w") as f:
-        json.dump(data, f, indent=2)
+    records_path = term_dir / "records.jsonl"
+    if records_path.exists():
+        data["records"] = _read_records(records_path)
+    return data
 
 
 def _chunked(iterable: List, size: int) -> Iterator[List]:
@@ -45,9 +129,10 @@ def _chunked(iterable: List, size: int) -> Iterator[List]:
         yield iterable[i:i + size]
 
 
-def _search_year(term: str, year: int, max_retries: int = 3) -> List[str]:
+def _search_year(term: str, year: int) -> Optional[List[str]]:
     """
-    Search PubMed for PMIDs in a given year, with retries on HTTP 429.
+    Search PubMed for PMIDs in a given year.
+    Returns None if the search failed, as opposed to [] for no results.
     """
     params = {
         "db": "pubmed",
@@ -57,55 +142,54 @@ def _search_year(term: str, year: int, max_retries: int = 3) -> List[str]:
         "datetype": "pdat",
         "mindate": str(year),
         "maxdate": str(year),
-        **({"api_key": os.getenv("NCBI_API_KEY")} if os.getenv("NCBI_API_KEY") else {})
+        **api_key_params()
     }
 
-    for attempt in range(1, max_retries + 1):
-        resp = requests.get(ESEARCH_URL, params=params)
-        if resp.status_code == 429:
-            wait = 2 ** attempt
-            logger.warning("HTTP 429 on year %d (attempt %d/%d), retrying in %ds", year, attempt, max_retries, wait)
-            time.sleep(wait)
-            continue
-        try:
-            resp.raise_for_status()
-        except requests.HTTPError:
-            logger.error("HTTP error for year %d: %s", year, resp.status_code)
-            return []
-        return resp.json().get("esearchresult", {}).get("idlist", [])
-
-    logger.error("Failed to fetch PMIDs for %d after %d retries", year, max_retries)
-    return []
+    try:
+        resp = http_get(ESEARCH_URL, params=params, stream=True)
+    except requests.RequestException as e:
+        logger.error("Failed to fetch PMIDs for %d: %s", year, e)
+        return None
+    if not resp.ok:
+        resp.close()
+        logger.error("HTTP error for year %d: %s", year, resp.status_code)
+        return None
+    try:
+        data = read_json(resp)
+    except BODY_READ_ERRORS as e:
+        logger.error("Failed to read PMIDs for %d: %s", year, e)
+        return None
+    return data.get("esearchresult", {}).get("idlist", [])
 
 
-def _fetch_pmids(pmids: List[str], batch_size: int, max_retries: int = 3) -> List[Dict]:
+def _fetch_chunk(chunk: List[str]) -> Optional[List[Dict]]:
+    """Fetch one EFetch batch; returns None if the request failed."""
     records: List[Dict] = []
-    for chunk in _chunked(pmids, batch_size):
-        for attempt in range(1, max_retries + 1):
-            params = {
-                "db": "pubmed",
-                "id": ",".join(chunk),
-                "retmode": "xml",
-                **({"api_key": os.getenv("NCBI_API_KEY")} if os.getenv("NCBI_API_KEY") else {})
-            }
-            resp = requests.get(EFETCH_URL, params=params)
-            if resp.status_code == 429:
-                wait = 2 ** attempt
-                logger.warning("HTTP 429 for efetch (attempt %d/%d), retrying in %ds", attempt, max_retries, wait)
-                time.sleep(wait)
-                continue
-            try:
-                resp.raise_for_status()
-            except requests.HTTPError:
-                logger.error("Failed to fetch PMIDs: %s", resp.status_code)
-                break
-
-            root = ET.fromstring(resp.text)
-            for art in root.findall(".//PubmedArticle"):
+    params = {
+        "db": "pubmed",
+        "id": ",".join(chunk),
+        "retmode": "xml",
+        **api_key_params()
+    }
+    try:
+        resp = http_get(EFETCH_URL, params=params, stream=True)
+    except requests.RequestException as e:
+        logger.error("Failed to fetch PMIDs: %s", e)
+        return None
+
+    with resp:
+        if not resp.ok:
+            logger.error("Failed to fetch PMIDs: %s", resp.status_code)
+            return None
+
+        # Parse articles as they stream in and free each one once it has been read
+        resp.raw.decode_content = True
+        try:
+            for _, art in etree.iterparse(resp.raw, tag="PubmedArticle"):
                 pmid = art.findtext(".//PMID", default="")
                 title = art.findtext(".//ArticleTitle", default="")
                 abstract = " ".join(p.text or "" for p in art.findall(".//AbstractText"))
-                year = (
+                year = _parse_year(
                     art.findtext(".//PubDate/Year")
                     or art.findtext(".//PubDate/MedlineDate", default="").split(" ")[0]
                 )
@@ -115,62 +199,89 @@ def _fetch_pmids(pmids: List[str], batch_size: int, max_retries: int = 3) -> Lis
                     "abstract": abstract,
                     "year": year
                 })
-            time.sleep(0.34)
-            break  # break retry loop on success
+                art.clear()
+                while art.getprevious() is not None:
+                    del art.getparent()[0]
+        except (*BODY_READ_ERRORS, etree.XMLSyntaxError) as e:
+            logger.error("Failed to read PMIDs: %s", e)
+            return None
     return records
 
 
+def _fetch_pmids(pmids: List[str], batch_size: int) -> Iterator[Tuple[List[str], Optional[List[Dict]]]]:
+    """
+    Fetch abstracts for `pmids`, requesting up to MAX_CONCURRENT_REQUESTS batches at once.
+    Yields (chunk, records) for each batch in order, as each becomes available;
+    records is None if the batch failed.
+    """
+    chunks = list(_chunked(pmids, batch_size))
+    return zip(chunks, iter_concurrently(_fetch_chunk, chunks))
+
+
 def retrieve_full_data(term: str,
                        start_year: int = config.START_YEAR,
                        end_year: int = None) -> List[Dict]:
     """
     Retrieve all PubMed records for a term across a year range, using caching and retries.
     """
-    end_year = end_year or datetime.now().year
+    current_year = datetime.now().year
+    end_year = end_year or current_year
     data = _load_data(term)
     done = set(int(y) for y in data.get("completed_years", []))
     existing = {r["pmid"] for r in data.get("records", [])}
     updated = False
 
+    years = []
     for year in range(start_year, end_year + 1):
-        is_current = (year == datetime.now().year)
-
-        if year in done and not is_current:
+        if year in done and year != current_year:
             logger.info("Skipping year %d (already done)", year)
             continue
+        years.append(year)
 
-        logger.info("Year %d: searching PubMed for '%s'...", year, term)
-        pmids = _search_year(term, year)
-
-        if not pmids:
-            logger.info(" → no PMIDs found for %d", year)
-            if not is_current:
-                data["completed_years"].append(year)
-                updated = True
-            continue
+    logger.info("Searching PubMed for '%s' in %d years...", term, len(years))
+    search_results = run_concurrently(lambda y: _search_year(term, y), years)
 
-        new_pmids = [p for p in pmids if p not in existing]
-        if not new_pmids:
-            logger.info(" → no new PMIDs in %d", year)
-            if not is_current:
-                data["completed_years"].append(year)
-                updated = True
-            continue
+    to_fetch: List[str] = []
+    fetch_year: Dict[str, int] = {}
+    failed_years = set()  # left out of completed_years so the next run retries them
+    for year, pmids in zip(years, search_results):
+        if pmids is None:
+            logger.warning("Year %d: search failed; will retry on the next run", year)
+            failed_years.add(year)
+        elif not pmids:
+            logger.info("Year %d: no PMIDs found", year)
+        else:
+            new_pmids = [p for p in pmids if p not in existing]
+            if not new_pmids:
+                logger.info("Year %d: no new PMIDs", year)
+            else:
+                logger.info("Year %d: %d new PMIDs", year, len(new_pmids))
+                to_fetch.extend(new_pmids)
+                fetch_year.update(dict.fromkeys(new_pmids, year))
+                existing.update(new_pmids)
 
-        logger.info(" → fetching %d abstracts", len(new_pmids))
-        recs = _fetch_pmids(new_pmids, config.BATCH_SIZE)
-        data["records"].extend(recs)
-        existing.update(new_pmids)
+    if to_fetch:
+        logger.info(" → fetching %d abstracts", len(to_fetch))
+        # Append each batch as it arrives, so an interrupted run keeps what it fetched
+        for chunk, recs in _fetch_pmids(to_fetch, config.BATCH_SIZE):
+            if recs is None:
+                failed_years.update(fetch_year[p] for p in chunk)
+                continue
+            _append_records(_term_dir(term), recs)
+            data["records"].extend(recs)
 
-        if not is_current:
+    for year in years:
+        if year != current_year and year not in failed_years:
             data["completed_years"].append(year)
+            updated = True
 
-        updated = True
-
+    # Written after the records, so an interrupted run re-checks its years
     if updated:
-        _save_data(term, data)
-        logger.info("Data file updated for '%s'", term)
+        _save_meta(_term_dir(term), data["completed_years"])
+
+    if updated or to_fetch:
+        logger.info("Data files updated for '%s'", term)
     else:
-        logger.info("Data file for '%s' already up to date", term)
+        logger.info("Data files for '%s' already up to date", term)
 
     return data["records"]
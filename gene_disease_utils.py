@@ -1,61 +1,97 @@
-import os
-import re
-import time
-import json
 import logging
+import sqlite3
+import threading
 import requests
+from collections import defaultdict
 from pathlib import Path
 from typing import List, Dict, Optional
 
+from http_utils import BODY_READ_ERRORS, api_key_params, http_get, read_json, run_concurrently
+
 # Entrez and MeSH endpoints
 ESUMMARY_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi"
 MESH_LOOKUP_URL = "https://id.nlm.nih.gov/mesh/lookup/descriptor"
 
-# Cache directory for resolved names
+# Cache of resolved names, one SQLite table keyed by (prefix, id)
 CACHE_DIR = Path.home() / ".temporal_gdg_cache"
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
+CACHE_DB = CACHE_DIR / "names.db"
+
+# SQLite caps the number of host parameters per statement
+_SQL_CHUNK = 500
+
+# Shared by every pipeline thread; _cache_lock serializes access
+_cache_conn = sqlite3.connect(CACHE_DB, check_same_thread=False)
+_cache_lock = threading.Lock()
+_cache_conn.execute(
+    "CREATE TABLE IF NOT EXISTS names("
+    "prefix TEXT, id TEXT, name TEXT, PRIMARY KEY(prefix, id))"
+)
 
 logger = logging.getLogger(__name__)
 
-# Valid MeSH IDs: D###### or C######
-MESH_UI_PATTERN = re.compile(r"^[DC]\d{6}$")
 
+def _is_mesh_ui(s: str) -> bool:
+    """Valid MeSH IDs: D###### or C######."""
+    return len(s) == 7 and s[0] in ("D", "C") and s[1:].isdigit()
 
-def _cache_path(prefix: str, id_: str) -> Path:
-    return CACHE_DIR / f"{prefix}_{id_}.json"
 
+def _load_cached_bulk(prefix: str, ids: List[str]) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for i in range(0, len(ids), _SQL_CHUNK):
+        chunk = ids[i:i + _SQL_CHUNK]
+        placeholders = ",".join("?" * len(chunk))
+        with _cache_lock:
+            rows = _cache_conn.execute(
+                f"SELECT id, name FROM names WHERE prefix = ? AND id IN ({placeholders})",
+                (prefix, *chunk),
+            ).fetchall()
+        out.update(rows)
+    return out
 
-def _load_cached_name(prefix: str, id_: str) -> Optional[str]:
-    path = _cache_path(prefix, id_)
-    if path.exists():
-        return json.loads(path.read_text()).get("name")
-    return None
 
+def _save_cached_bulk(prefix: str, names: Dict[str, str]):
+    with _cache_lock, _cache_conn:
+        _cache_conn.executemany(
+            "INSERT OR REPLACE INTO names(prefix, id, name) VALUES (?, ?, ?)",
+            ((prefix, id_, name) for id_, name in names.items()),
+        )
 
-def _save_cached_name(prefix: str, id_: str, name: str):
-    _cache_path(prefix, id_).write_text(json.dumps({"name": name}, indent=2))
+
+def _fetch_summary_chunk(db: str, chunk: List[str]) -> Dict[str, Optional[dict]]:
+    """ESummary results keyed by UID; UIDs are left out when the request failed."""
+    out = {}
+    params = {
+        "db": db,
+        "id": ",".join(chunk),
+        "retmode": "json",
+        **api_key_params(),
+    }
+    try:
+        resp = http_get(ESUMMARY_URL, params=params, stream=True)
+    except requests.RequestException as e:
+        logger.warning("ESummary failed for %s: %s", chunk, e)
+        return out
+
+    if resp.ok:
+        try:
+            data = read_json(resp).get("result", {})
+        except BODY_READ_ERRORS as e:
+            logger.warning("ESummary failed for %s: %s", chunk, e)
+            return out
+        for uid in data.get("uids", []):
+            out[uid] = data.get(uid)
+    else:
+        resp.close()
+        logger.warning("ESummary failed for %s: HTTP %s", chunk, resp.status_code)
+    return out
 
 
 def _batch_fetch(db: str, ids: List[str], batch_size: int = 200) -> Dict[str, Optional[dict]]:
+    chunks = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
     out = {}
-    for i in range(0, len(ids), batch_size):
-        chunk = ids[i:i + batch_size]
-        params = {
-            "db": db,
-            "id": ",".join(chunk),
-            "retmode": "json",
-            **({"api_key": os.getenv("NCBI_API_KEY")} if os.getenv("NCBI_API_KEY") else {}),
-        }
-        resp = requests.get(ESUMMARY_URL, params=params)
-        if resp.ok:
-            data = resp.json().get("result", {})
-            for uid in data.get("uids", []):
-                out[uid] = data.get(uid)
-        else:
-            logger.warning("ESummary failed for %s: HTTP %s", chunk, resp.status_code)
-            for uid in chunk:
-                out[uid] = None
-        time.sleep(0.34)
+    for part in run_concurrently(lambda chunk: _fetch_summary_chunk(db, chunk), chunks):
+        out.update(part)
     return out
 
 
@@ -65,52 +101,66 @@ def get_gene_names(gene_ids: List[str]) -> Dict[str, str]:
     Uses disk cache to avoid repeated lookups.
     """
     unique = [gid for gid in set(gene_ids) if gid.isdigit()]
-    res, to_fetch = {}, []
-
-    for gid in unique:
-        cached = _load_cached_name("gene", gid)
-        if cached:
-            res[gid] = cached
-        else:
-            to_fetch.append(gid)
+    res = _load_cached_bulk("gene", unique)
+    to_fetch = [gid for gid in unique if gid not in res]
 
     if to_fetch:
         summaries = _batch_fetch("gene", to_fetch)
-        for gid, summary in summaries.items():
-            name = summary.get("name") if summary else gid
-            res[gid] = name
-            _save_cached_name("gene", gid, name)
+        # Only real names are cached; IDs whose lookup failed fall back to
+        # the ID for this run and are retried next time
+        fetched = {
+            gid: summary["name"]
+            for gid, summary in summaries.items()
+            if summary and summary.get("name")
+        }
+        _save_cached_bulk("gene", fetched)
+        res.update({gid: fetched.get(gid, gid) for gid in to_fetch})
 
     return res
 
 
+def _fetch_mesh_chunk(chunk: List[str]) -> Dict[str, str]:
+    out = {}
+    try:
+        resp = http_get(MESH_LOOKUP_URL, params={"descriptor": ",".join(chunk)}, stream=True)
+    except requests.RequestException as e:
+        logger.warning("MeSH lookup failed for %s: %s", chunk, e)
+        return out
+
+    if resp.status_code == 400:
+        resp.close()
+        logger.warning("MeSH lookup bad request for %s; skipping.", chunk)
+        return out
+
+    if resp.ok:
+        try:
+            entries = read_json(resp)
+        except BODY_READ_ERRORS as e:
+            logger.warning("MeSH lookup failed for %s: %s", chunk, e)
+            return out
+        for entry in entries:
+            ui = entry.get("descriptor")
+            label = entry.get("label")
+            if ui and label:
+                out[ui] = label
+    else:
+        resp.close()
+        logger.warning("MeSH lookup failed for %s: HTTP %s", chunk, resp.status_code)
+
+    return out
+
+
 def _batch_fetch_mesh_names(cores: List[str], batch_size: int = 50) -> Dict[str, str]:
     """
     Batch lookup for MeSH UI codes using the descriptor API.
     Returns mapping from code → name.
     """
-    out = {}
-    valid = [c for c in cores if MESH_UI_PATTERN.match(c)]
-
-    for i in range(0, len(valid), batch_size):
-        chunk = valid[i:i + batch_size]
-        resp = requests.get(MESH_LOOKUP_URL, params={"descriptor": ",".join(chunk)})
-
-        if resp.status_code == 400:
-            logger.warning("MeSH lookup bad request for %s; skipping.", chunk)
-            continue
-
-        if resp.ok:
-            for entry in resp.json():
-                ui = entry.get("descriptor")
-                label = entry.get("label")
-                if ui and label:
-                    out[ui] = label
-        else:
-            logger.warning("MeSH lookup failed for %s: HTTP %s", chunk, resp.status_code)
-
-        time.sleep(0.34)
+    valid = [c for c in cores if _is_mesh_ui(c)]
+    chunks = [valid[i:i + batch_size] for i in range(0, len(valid), batch_size)]
 
+    out = {}
+    for part in run_concurrently(_fetch_mesh_chunk, chunks):
+        out.update(part)
     return out
 
 
@@ -120,31 +170,33 @@ def get_disease_names(mesh_ids: List[str]) -> Dict[str, str]:
     Valid MeSH codes (D###### or C######) are resolved via batch API.
     Others are returned as-is.
     """
-    cores = []
+    core_to_mids: Dict[str, List[str]] = defaultdict(list)
     res: Dict[str, str] = {}
 
     for mid in set(mesh_ids):
-        prefix, core = mid.split(":", 1) if ":" in mid else (None, mid)
-
-        if MESH_UI_PATTERN.match(core):
-            cached = _load_cached_name("mesh", core)
-            if cached and cached != core:
-                res[mid] = cached
-            else:
-                cores.append(core)
+        core = mid.split(":", 1)[-1]
+        if _is_mesh_ui(core):
+            core_to_mids[core].append(mid)
         else:
             res[mid] = mid  # nonstandard, keep raw ID
 
-    if cores:
-        labels = _batch_fetch_mesh_names(cores)
-        for core in cores:
-            name = labels.get(core) or core
+    cached = _load_cached_bulk("mesh", list(core_to_mids))
+    labels = {core: name for core, name in cached.items() if name != core}
+    missing = [core for core in core_to_mids if core not in labels]
+
+    if missing:
+        fetched = _batch_fetch_mesh_names(missing)
+        resolved = {}
+        for core in missing:
+            name = fetched.get(core) or core
             if core == name:
                 logger.warning("No MeSH label for %s; using code.", core)
-            _save_cached_name("mesh", core, name)
+            resolved[core] = name
+        _save_cached_bulk("mesh", resolved)
+        labels.update(resolved)
 
-            for mid in mesh_ids:
-                if mid.split(":", 1)[-1] == core:
-                    res[mid] = name
+    for core, mids in core_to_mids.items():
+        for mid in mids:
+            res[mid] = labels[core]
 
     return res
@@ -1,5 +1,6 @@
 import networkx as nx
-import pickle
+import pyarrow as pa
+import pyarrow.parquet as pq
 import logging
 from typing import Optional, List, Dict, Any
 
@@ -7,6 +8,17 @@ from ner import extract_gene_disease_pairs
 
 logger = logging.getLogger(__name__)
 
+# Prefixed disease IDs accepted as-is
+_DIS_PREFIXES = ("MESH:", "OMIM:")
+
+# Columnar layout used to persist the co-mention graph
+EDGE_SCHEMA = pa.schema([
+    ("gene", pa.string()),
+    ("disease", pa.string()),
+    ("pmids", pa.list_(pa.string())),
+    ("years", pa.list_(pa.int32())),
+])
+
 
 def is_valid_gene_id(gene_id: str) -> bool:
     return gene_id.isdigit()
@@ -14,7 +26,7 @@ def is_valid_gene_id(gene_id: str) -> bool:
 
 def is_valid_disease_id(disease_id: str) -> bool:
     return (
-        disease_id.startswith(("MESH:", "OMIM:")) or
+        disease_id.startswith(_DIS_PREFIXES) or
         (disease_id.startswith("D") and disease_id[1:].isdigit())
     )
 
@@ -28,27 +40,28 @@ def build_temporal_graph(
     Build the gene-disease co-mention graph.
     Uses pre-fetched `records` if provided, otherwise retrieves data.
     """
-    pairs = extract_gene_disease_pairs(term, batch_size=batch_size, records=records)
+    edges = extract_gene_disease_pairs(term, batch_size=batch_size, records=records)
 
-    G = nx.Graph()
+    node_types: Dict[str, str] = {}
+    valid_edges = []
     skipped = 0
 
-    for pmid, gene, disease, year in pairs:
-        if not is_valid_gene_id(gene) or not is_valid_disease_id(disease):
-            logger.warning("Skipping invalid pair %s %s %s", pmid, gene, disease)
+    for (gene, disease), attrs in edges.items():
+        # IDs already in node_types have been validated on an earlier edge
+        gene_ok = gene in node_types or is_valid_gene_id(gene)
+        disease_ok = disease in node_types or is_valid_disease_id(disease)
+        if not gene_ok or not disease_ok:
+            logger.warning("Skipping invalid pair %s %s (%d PMIDs)", gene, disease, len(attrs["pmids"]))
             skipped += 1
             continue
 
-        if not G.has_node(gene):
-            G.add_node(gene, type="gene")
-        if not G.has_node(disease):
-            G.add_node(disease, type="disease")
+        node_types.setdefault(gene, "gene")
+        node_types.setdefault(disease, "disease")
+        valid_edges.append((gene, disease, attrs))
 
-        if G.has_edge(gene, disease):
-            G[gene][disease]["pmids"].append(pmid)
-            G[gene][disease]["years"].append(year)
-        else:
-            G.add_edge(gene, disease, pmids=[pmid], years=[year])
+    G = nx.Graph()
+    G.add_nodes_from((n, {"type": t}) for n, t in node_types.items())
+    G.add_edges_from(valid_edges)
 
     logger.info(
         "Built graph for '%s': %d nodes, %d edges (skipped %d invalid)",
@@ -58,6 +71,20 @@ def build_temporal_graph(
 
 
 def save_graph(G: nx.Graph, filepath: str):
-    with open(filepath, "wb") as f:
-        pickle.dump(G, f)
+    """
+    Save the graph as a Parquet edge list (gene, disease, pmids, years).
+    """
+    genes, diseases, pmids, years = [], [], [], []
+    for u, v, attrs in G.edges(data=True):
+        gene, disease = (u, v) if G.nodes[u].get("type") == "gene" else (v, u)
+        genes.append(gene)
+        diseases.append(disease)
+        pmids.append(attrs.get("pmids", []))
+        years.append(attrs.get("years", []))
+
+    table = pa.Table.from_pydict(
+        {"gene": genes, "disease": diseases, "pmids": pmids, "years": years},
+        schema=EDGE_SCHEMA,
+    )
+    pq.write_table(table, filepath, compression="zstd")
     logger.info("Graph saved to %s", filepath)
@@ -0,0 +1,133 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+import orjson
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+import config
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+REQUEST_TIMEOUT = 30  # seconds
+
+# Errors to expect while reading a stream=True body: reads through resp.raw
+# raise urllib3's exceptions rather than requests' wrapped ones.
+BODY_READ_ERRORS = (requests.RequestException, urllib3.exceptions.HTTPError)
+
+class RateLimitedRetry(Retry):
+    """Retry that takes a LIMITER token before each retried request."""
+
+    def sleep(self, response=None):
+        super().sleep(response)
+        LIMITER.acquire()
+
+
+# Per-request retry policy: throttled and failed GETs are retried by urllib3
+# up to 5 times with exponential backoff (0, 2, 4, 8, 16 s with urllib3 2.x),
+# waiting for the server's Retry-After instead when one is sent. Retries go
+# through LIMITER like first attempts do. Once retries run out, requests
+# raises RetryError.
+RETRY = RateLimitedRetry(
+    total=5,
+    backoff_factor=1.0,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=frozenset({"GET"}),
+    respect_retry_after_header=True,
+)
+
+# One keep-alive session shared by every module, so TCP/TLS connections
+# to NCBI are reused.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=RETRY,
+))
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: holds up to `capacity` tokens and refills at
+    `refill_rate` tokens per second. Each request takes one token.
+    """
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity,
+                                   self._tokens + (now - self._last) * self.refill_rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.refill_rate
+            time.sleep(wait)
+
+
+# Shared by every caller, so concurrent batches and back-to-back pipeline
+# steps together stay within NCBI's allowance.
+LIMITER = RateLimiter(config.REQUESTS_PER_SECOND, config.REQUESTS_PER_SECOND)
+
+
+def api_key_params() -> Dict[str, str]:
+    key = os.getenv("NCBI_API_KEY")
+    return {"api_key": key} if key else {}
+
+
+def http_get(url: str, params: Optional[Dict] = None, **kwargs) -> requests.Response:
+    """
+    GET `url` on the shared session once the rate limiter allows it.
+    Raises requests.RetryError once urllib3 has given up retrying, or another
+    requests.RequestException for connection failures.
+    """
+    LIMITER.acquire()
+    return SESSION.get(url, params=params, timeout=REQUEST_TIMEOUT, **kwargs)
+
+
+def read_json(resp: requests.Response):
+    """
+    Decode a response requested with stream=True straight from the raw body,
+    skipping the intermediate str/bytes copies. Closes the response.
+    Read failures raise one of BODY_READ_ERRORS.
+    """
+    with resp:
+        resp.raw.decode_content = True
+        return orjson.loads(resp.raw.read())
+
+
+def iter_concurrently(fn: Callable[[T], R], items: Iterable[T]) -> Iterator[R]:
+    """
+    Apply `fn` to every item on a bounded thread pool.
+    Yields results in the same order as `items`, each as it becomes available;
+    a slow item holds back the results after it.
+    """
+    items = list(items)
+    if not items:
+        return
+    workers = min(config.MAX_CONCURRENT_REQUESTS, len(items))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(fn, items)
+
+
+def run_concurrently(fn: Callable[[T], R], items: Iterable[T]) -> List[R]:
+    """
+    Apply `fn` to every item on a bounded thread pool.
+    Results are returned in the same order as `items`.
+    """
+    return list(iter_concurrently(fn, items))
@@ -1,10 +1,14 @@
-import time
 import logging
+import sqlite3
+import orjson
 import requests
-import json
+from collections import defaultdict
+from pathlib import Path
 from typing import List, Tuple, Dict, Optional
 
+import config
 from data_retrieval import retrieve_full_data
+from http_utils import BODY_READ_ERRORS, http_get, iter_concurrently, read_json
 
 # PubTator BioC JSON export endpoint
 PUBTATOR_URL = (
@@ -12,6 +16,9 @@ PUBTATOR_URL = (
     "publications/export/biocjson"
 )
 
+# SQLite caps the number of host parameters per statement
+_SQL_CHUNK = 500
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,63 +30,135 @@ def _split_ids(identifier: str) -> List[str]:
     return [identifier.strip()]
 
 
-def annotate_pmids(pmids: List[str], batch_size: int = 100) -> Dict[str, Dict]:
+def _annotate_chunk(chunk: List[str]) -> Dict[str, Dict]:
     annotations: Dict[str, Dict] = {}
-
-    for i in range(0, len(pmids), batch_size):
-        chunk = pmids[i:i + batch_size]
-        resp = requests.get(PUBTATOR_URL, params={
+    try:
+        resp = http_get(PUBTATOR_URL, params={
             "pmids": ",".join(chunk),
             "concepts": "Gene,Disease"
-        })
+        }, stream=True)
+    except requests.RequestException as e:
+        logger.warning("PubTator request failed for PMIDs %s: %s", chunk, e)
+        return annotations
+
+    try:
+        data = read_json(resp)
+    except orjson.JSONDecodeError:
+        logger.warning("Non‑JSON response for PMIDs %s, skipping batch.", chunk)
+        return annotations
+    except BODY_READ_ERRORS as e:
+        logger.warning("PubTator response unreadable for PMIDs %s: %s", chunk, e)
+        return annotations
+
+    docs = data.get("documents") or data.get("PubTator3") or []
+
+    for doc in docs:
+        pmid = doc.get("id")
+        ann = {"genes": [], "diseases": []}
+
+        for passage in doc.get("passages", []):
+            text = passage.get("text", "")
+            denots = (
+                passage.get("annotations")
+                or passage.get("denotations")
+                or passage.get("annotation")
+                or []
+            )
 
-        try:
-            data = resp.json()
-        except json.JSONDecodeError:
-            logger.warning("Non‑JSON response for PMIDs %s, skipping batch.", chunk)
-            time.sleep(0.3)
-            continue
+            for inf in denots:
+                infons = inf.get("infons", {})
+                t = infons.get("type", "").lower()
+                raw_id = infons.get("identifier", "").strip()
 
-        docs = data.get("documents") or data.get("PubTator3") or []
+                if not raw_id:
+                    continue
 
-        for doc in docs:
-            pmid = doc.get("id")
-            ann = {"genes": [], "diseases": []}
+                locs = inf.get("locations") or inf.get("location") or []
+                if not locs:
+                    continue
 
-            for passage in doc.get("passages", []):
-                text = passage.get("text", "")
-                denots = (
-                    passage.get("annotations")
-                    or passage.get("denotations")
-                    or passage.get("annotation")
-                    or []
-                )
+                offset = locs[0]["offset"]
+                length = locs[0]["length"]
+                snippet = text[offset:offset + length]
 
-                for inf in denots:
-                    infons = inf.get("infons", {})
-                    t = infons.get("type", "").lower()
-                    raw_id = infons.get("identifier", "").strip()
+                for ident in _split_ids(raw_id):
+                    if t == "gene":
+                        ann["genes"].append((offset, offset + length, snippet, ident))
+                    elif t == "disease":
+                        ann["diseases"].append((offset, offset + length, snippet, ident))
 
-                    if not raw_id:
-                        continue
+        annotations[pmid] = ann
+
+    return annotations
 
-                    locs = inf.get("locations") or inf.get("location") or []
-                    if not locs:
-                        continue
 
-                    offset = locs[0]["offset"]
-                    length = locs[0]["length"]
-                    snippet = text[offset:offset + length]
+def _annotation_cache(term: str) -> Path:
+    safe = term.replace(" ", "_")
+    return config.DATA_DIR / f"{safe}_annotations.sqlite"
 
-                    for ident in _split_ids(raw_id):
-                        if t == "gene":
-                            ann["genes"].append((offset, offset + length, snippet, ident))
-                        elif t == "disease":
-                            ann["diseases"].append((offset, offset + length, snippet, ident))
 
-            annotations[pmid] = ann
+def _open_annotation_cache(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS annotations("
+        "pmid TEXT PRIMARY KEY, genes BLOB, diseases BLOB)"
+    )
+    return conn
+
+
+def _load_cached_annotations(conn: sqlite3.Connection, pmids: List[str]) -> Dict[str, Dict]:
+    annotations: Dict[str, Dict] = {}
+    for i in range(0, len(pmids), _SQL_CHUNK):
+        chunk = pmids[i:i + _SQL_CHUNK]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(
+            f"SELECT pmid, genes, diseases FROM annotations WHERE pmid IN ({placeholders})",
+            chunk,
+        )
+        for pmid, genes, diseases in rows:
+            annotations[pmid] = {"genes": orjson.loads(genes), "diseases": orjson.loads(diseases)}
+    return annotations
+
+
+def _save_cached_annotations(conn: sqlite3.Connection, annotations: Dict[str, Dict]):
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO annotations(pmid, genes, diseases) VALUES (?, ?, ?)",
+            (
+                (pmid, orjson.dumps(ann["genes"]), orjson.dumps(ann["diseases"]))
+                for pmid, ann in annotations.items()
+            ),
+        )
+
+
+def annotate_pmids(
+    pmids: List[str],
+    batch_size: int = 100,
+    cache_path: Optional[Path] = None
+) -> Dict[str, Dict]:
+    """
+    Annotate PMIDs with PubTator, requesting up to MAX_CONCURRENT_REQUESTS batches at once.
+    If `cache_path` is given, PMIDs already stored there are not re-annotated and
+    each new batch is written to it in order, as each becomes available.
+    """
+    pmids = list(dict.fromkeys(pmids))
+    conn = _open_annotation_cache(cache_path) if cache_path else None
+    annotations: Dict[str, Dict] = {}
 
-        time.sleep(0.3)
+    try:
+        if conn:
+            annotations = _load_cached_annotations(conn, pmids)
+            pmids = [p for p in pmids if p not in annotations]
+            logger.info("%d PMIDs already annotated, %d to annotate", len(annotations), len(pmids))
+
+        chunks = [pmids[i:i + batch_size] for i in range(0, len(pmids), batch_size)]
+        for part in iter_concurrently(_annotate_chunk, chunks):
+            annotations.update(part)
+            if conn:
+                _save_cached_annotations(conn, part)
+    finally:
+        if conn:
+            conn.close()
 
     return annotations
 
@@ -88,20 +167,24 @@ def extract_gene_disease_pairs(
     term: str,
     batch_size: int = 100,
     records: Optional[List[Dict]] = None
-) -> List[Tuple[str, str, str, str]]:
+) -> Dict[Tuple[str, str], Dict[str, list]]:
     """
     Full pipeline: retrieve → annotate → extract co‑mentions.
     If `records` is provided, retrieval is skipped.
-    Returns list of (pmid, gene_id, disease_id, year).
+    Returns {(gene_id, disease_id): {"pmids": [...], "years": [...]}}, with one
+    pmid/year entry per abstract mentioning both. Unknown years are None.
     """
     if records is None:
         records = retrieve_full_data(term)
 
     pmids = [r["pmid"] for r in records]
     year_map = {r["pmid"]: r["year"] for r in records}
-    ann = annotate_pmids(pmids, batch_size=batch_size)
+    ann = annotate_pmids(pmids, batch_size=batch_size, cache_path=_annotation_cache(term))
 
-    results: List[Tuple[str, str, str, str]] = []
+    edges: Dict[Tuple[str, str], Dict[str, list]] = defaultdict(
+        lambda: {"pmids": [], "years": []}
+    )
+    mentions = 0
 
     for pmid, tags in ann.items():
         genes = {gid for *_, gid in tags["genes"] if gid.isdigit()}
@@ -124,9 +207,13 @@ def extract_gene_disease_pairs(
                 pmid, bad_genes, bad_diseases
             )
 
+        year = year_map.get(pmid)
         for g in genes:
             for d in diseases:
-                results.append((pmid, g, d, year_map.get(pmid, "")))
+                edge = edges[(g, d)]
+                edge["pmids"].append(pmid)
+                edge["years"].append(year)
+        mentions += len(genes) * len(diseases)
 
-    logger.info("Extracted %d gene–disease pairs for '%s'", len(results), term)
-    return results
+    logger.info("Extracted %d co-mentions of %d gene–disease pairs for '%s'", mentions, len(edges), term)
+    return dict(edges)
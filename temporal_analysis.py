@@ -1,27 +1,59 @@
-import pickle
 import logging
 import json
-from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
 
+import networkx as nx
+import numpy as np
+import orjson
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 logger = logging.getLogger(__name__)
 
+# Gene/disease IDs repeat across many edges, so they are stored as categories
+REPORT_DTYPES = {
+    "gene": "category",
+    "disease": "category",
+    "first_mention": "int32",
+    "peak_year": "int32",
+    "time_to_peak": "int32",
+    "total_mentions": "int32",
+    "peak_count": "int32",
+    "burstiness": "float32",
+    "annual_counts": "object",
+}
 
-def load_graph(filepath: str):
-    with open(filepath, "rb") as f:
-        G = pickle.load(f)
+
+def load_edges_parquet(filepath: str) -> pd.DataFrame:
+    """
+    Load the saved edge list (gene, disease, pmids, years) without building a graph.
+    """
+    edges = pd.read_parquet(filepath)
+    logger.info("Loaded %d edges from %s", len(edges), filepath)
+    return edges
+
+
+def load_graph(filepath: str) -> nx.Graph:
+    G = nx.Graph()
+    for row in pq.read_table(filepath).to_pylist():
+        gene, disease = row["gene"], row["disease"]
+        if gene not in G:
+            G.add_node(gene, type="gene")
+        if disease not in G:
+            G.add_node(disease, type="disease")
+        G.add_edge(gene, disease, pmids=row["pmids"], years=row["years"])
     logger.info("Loaded graph with %d nodes and %d edges",
                 G.number_of_nodes(), G.number_of_edges())
     return G
 
 
-def analyze_temporal_edges(G) -> pd.DataFrame:
+def _graph_edges(G) -> Tuple[List[Tuple[str, str, list]], int]:
     """
-    Analyze the temporal behavior of gene–disease links.
-    Computes first mention, peak year, burstiness, and annual counts.
+    Orient each graph edge as (gene, disease, years); count edges with bad node types.
     """
-    records = []
+    edges = []
     skipped = 0
 
     for u, v, attrs in G.edges(data=True):
@@ -29,23 +61,45 @@ def analyze_temporal_edges(G) -> pd.DataFrame:
         tv = G.nodes[v].get("type")
 
         if tu == "gene" and tv == "disease":
-            gene, disease = u, v
+            edges.append((u, v, attrs.get("years", [])))
         elif tv == "gene" and tu == "disease":
-            gene, disease = v, u
+            edges.append((v, u, attrs.get("years", [])))
         else:
             logger.warning("Edge %s-%s has bad types %s-%s", u, v, tu, tv)
             skipped += 1
-            continue
 
-        years = [int(y) for y in attrs.get("years", []) if y.isdigit()]
-        if not years:
+    return edges, skipped
+
+
+def analyze_temporal_edges(G) -> pd.DataFrame:
+    """
+    Analyze the temporal behavior of gene–disease links.
+    Computes first mention, peak year, burstiness, and annual counts.
+    `G` is either the co-mention graph or the edge table from load_edges_parquet.
+    """
+    records = []
+
+    if isinstance(G, pd.DataFrame):
+        edges, skipped = zip(G["gene"], G["disease"], G["years"]), 0
+    else:
+        edges, skipped = _graph_edges(G)
+
+    for gene, disease, years in edges:
+        # Unknown years are None on graph edges and NaN in the Parquet edge list
+        years = np.array(years, dtype=np.float64)
+        years = years[~np.isnan(years)].astype(np.int32)
+        if not years.size:
             continue
 
-        cnt = Counter(years)
-        first = min(cnt)
-        peak, peak_count = max(cnt.items(), key=lambda x: x[1])
-        total = sum(cnt.values())
+        # counts[i] is the number of mentions in year first + i
+        first = int(years.min())
+        counts = np.bincount(years - first)
+        peak_idx = int(counts.argmax())
+        peak = first + peak_idx
+        peak_count = int(counts[peak_idx])
+        total = int(years.size)
         burst = peak_count / total if total else 0.0
+        active = np.flatnonzero(counts)
 
         records.append({
             "gene": gene,
@@ -56,19 +110,52 @@ def analyze_temporal_edges(G) -> pd.DataFrame:
             "total_mentions": total,
             "peak_count": peak_count,
             "burstiness": burst,
-            "annual_counts": dict(sorted(cnt.items()))
+            "annual_counts": dict(zip((active + first).tolist(), counts[active].tolist()))
         })
 
     logger.info("Analyzed %d edges (skipped %d)", len(records), skipped)
-    df = pd.DataFrame(records)
+    df = pd.DataFrame(records, columns=REPORT_DTYPES.keys()).astype(REPORT_DTYPES)
     return df.sort_values("total_mentions", ascending=False).reset_index(drop=True)
 
 
 def save_report(df: pd.DataFrame, csv_path: str):
     """
     Save the DataFrame to CSV, serializing the annual_counts column.
+    A Parquet copy is written next to it with annual_counts as a native map column.
     """
     df_out = df.copy()
     df_out["annual_counts"] = df_out["annual_counts"].apply(json.dumps)
     df_out.to_csv(csv_path, index=False)
-    logger.info("Report saved (with annual_counts) to %s", csv_path)
+
+    parquet_path = Path(csv_path).with_suffix(".parquet")
+    table = pa.Table.from_pandas(df.drop(columns="annual_counts"), preserve_index=False)
+    counts = pa.array(
+        [list(d.items()) for d in df["annual_counts"]],
+        type=pa.map_(pa.int32(), pa.int32()),
+    )
+    table = table.add_column(df.columns.get_loc("annual_counts"), "annual_counts", counts)
+    pq.write_table(table, parquet_path)
+    logger.info("Report saved (with annual_counts) to %s and %s", csv_path, parquet_path)
+
+
+def _parse_counts_json(s: str) -> Dict[int, int]:
+    """annual_counts from the CSV: JSON object keys are strings, so restore int years."""
+    return {int(k): v for k, v in orjson.loads(s).items()}
+
+
+def load_report(csv_path: str) -> pd.DataFrame:
+    """
+    Load a report written by save_report, preferring its Parquet copy.
+    annual_counts is returned as dicts with int year keys from either source.
+    """
+    parquet_path = Path(csv_path).with_suffix(".parquet")
+    if parquet_path.exists():
+        df = pd.read_parquet(parquet_path)
+        convert = dict
+    else:
+        df = pd.read_csv(csv_path, dtype={"gene": str, "disease": str})
+        convert = _parse_counts_json
+
+    if "annual_counts" in df.columns:
+        df["annual_counts"] = df["annual_counts"].map(convert)
+    return df